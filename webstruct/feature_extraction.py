@@ -35,12 +35,13 @@ Usually, the approach is the following:
 
 """
 from __future__ import absolute_import, print_function
-from itertools import chain
 from collections import Counter
-from six.moves import zip
+from six.moves import intern, zip
 
+import numpy as np
+from scipy import sparse as sp
 from sklearn.base import BaseEstimator, TransformerMixin
-from webstruct.utils import merge_dicts
+from sklearn.feature_extraction import DictVectorizer
 
 
 class HtmlFeatureExtractor(BaseEstimator, TransformerMixin):
@@ -118,66 +119,135 @@ class HtmlFeatureExtractor(BaseEstimator, TransformerMixin):
         TODO: if ``min_df`` is a dictionary, it should map feature names
         to thresholds.
 
+    sparse : bool, optional
+        When True, :meth:`fit_transform` and :meth:`transform` vectorize
+        feature dicts with :class:`sklearn.feature_extraction.DictVectorizer`
+        and return a single ``scipy.sparse`` CSR matrix with one row per
+        token (documents are stacked in order) instead of lists of feature
+        dicts. ``min_df`` pruning is applied as a column mask based on
+        document frequencies. Default is False.
+
+    n_jobs : integer, optional
+        Number of jobs for extracting features from documents in
+        parallel (via joblib). Threads are used rather than processes:
+        :class:`~.HtmlToken` instances hold references to lxml elements,
+        which can't be pickled across process boundaries. Default is 1.
+
     """
-    def __init__(self, token_features, global_features=None, min_df=1):
+    def __init__(self, token_features, global_features=None, min_df=1,
+                 sparse=False, n_jobs=1):
         self.token_features = token_features
         self.global_features = global_features or []
         self.min_df = min_df
+        self.sparse = sparse
+        self.n_jobs = n_jobs
 
     def fit(self, html_token_lists, y=None):
         self.fit_transform(html_token_lists)
         return self
 
     def fit_transform(self, html_token_lists, y=None, **fit_params):
-        X = [self.transform_single(html_tokens) for html_tokens in html_token_lists]
+        X = self._transform_all(html_token_lists)
+        if self.sparse:
+            return self._sparse_fit_transform(X)
         return self._pruned(X, low=self.min_df)
 
     def transform(self, html_token_lists):
-        return [self.transform_single(html_tokens) for html_tokens in html_token_lists]
+        X = self._transform_all(html_token_lists)
+        if self.sparse:
+            return self.dict_vectorizer_.transform(
+                [fd for doc in X for fd in doc]
+            )
+        return X
+
+    def _transform_all(self, html_token_lists):
+        if self.n_jobs == 1:
+            return [self.transform_single(html_tokens)
+                    for html_tokens in html_token_lists]
+        from joblib import Parallel, delayed
+        return Parallel(n_jobs=self.n_jobs, prefer='threads')(
+            delayed(self.transform_single)(html_tokens)
+            for html_tokens in html_token_lists
+        )
 
     def transform_single(self, html_tokens):
-        feature_func = _CombinedFeatures(*self.token_features)
-        token_data = list(zip(html_tokens, map(feature_func, html_tokens)))
+        # the merge is inlined into the driver loop: no intermediate dict
+        # list and no extra call layer per token. Feature names and string
+        # values are interned while merging - the same handful of strings
+        # repeats across millions of per-token dicts, so interning shares
+        # one string object per distinct value and makes dict lookups
+        # compare by pointer.
+        feature_funcs = tuple(self.token_features)
+        token_data = []
+        append = token_data.append
+        for tok in html_tokens:
+            featdict = {}
+            for f in feature_funcs:
+                for k, v in f(tok).items():
+                    featdict[intern(k)] = intern(v) if type(v) is str else v
+            append((tok, featdict))
 
         for feat in self.global_features:
             feat(token_data)
 
         return [featdict for tok, featdict in token_data]
 
+    def _sparse_fit_transform(self, X):
+        self.dict_vectorizer_ = DictVectorizer(sparse=True)
+        X_csr = self.dict_vectorizer_.fit_transform(
+            [fd for doc in X for fd in doc]
+        )
+        mask = self._sparse_column_mask(X_csr, [len(doc) for doc in X])
+        if mask is not None:
+            X_csr = X_csr[:, mask]
+            self.dict_vectorizer_.restrict(mask)
+        if hasattr(self.dict_vectorizer_, 'get_feature_names_out'):
+            self.feature_names_ = list(self.dict_vectorizer_.get_feature_names_out())
+        else:
+            self.feature_names_ = self.dict_vectorizer_.get_feature_names()
+        return X_csr
+
+    def _sparse_column_mask(self, X_csr, doc_lengths):
+        """
+        Return a boolean mask of columns with document frequency
+        >= ``min_df`` (or None if no pruning is needed).
+        """
+        low = self.min_df
+        if low is None or low <= 1:
+            return None
+        # collapse token rows to one presence row per document,
+        # then count documents per column - all in C
+        n_tokens = X_csr.shape[0]
+        doc_ids = np.repeat(np.arange(len(doc_lengths)), doc_lengths)
+        doc_marker = sp.csr_matrix(
+            (np.ones(n_tokens), (doc_ids, np.arange(n_tokens))),
+            shape=(len(doc_lengths), n_tokens),
+        )
+        doc_presence = doc_marker.dot(X_csr != 0).astype(bool)
+        df = np.asarray(doc_presence.sum(axis=0)).ravel()
+        return df >= low
+
     def _pruned(self, X, low=None):
         if low is None or low <= 1:
             return X
         cnt = self._document_frequency(X)
-        keep = {k for (k, v) in cnt.items() if v >= low}
+        keep = frozenset(k for k, v in cnt.items() if v >= low)
         del cnt
-        return [
-            [{k: v for k, v in fd.items() if (k, v) in keep} for fd in doc]
-            for doc in X
-        ]
+        # prune in place: deleting rare entries frees them right away
+        # instead of keeping old and filtered copies of X alive at once
+        for doc in X:
+            for fd in doc:
+                rare = [k for k, v in fd.items() if (k, v) not in keep]
+                for k in rare:
+                    del fd[k]
+        return X
 
     def _document_frequency(self, X):
         cnt = Counter()
+        seen = set()  # reused across documents to avoid reallocation
         for doc in X:
-            seen_features = set(chain.from_iterable(fd.items() for fd in doc))
-            cnt.update(seen_features)
+            seen.clear()
+            for fd in doc:
+                seen.update(fd.items())
+            cnt.update(seen)
         return cnt
-
-
-class _CombinedFeatures(object):
-    """
-    Utility for combining several feature functions::
-
-        >>> from pprint import pprint
-        >>> def f1(tok): return {'upper': tok.isupper()}
-        >>> def f2(tok): return {'len': len(tok)}
-        >>> features = _CombinedFeatures(f1, f2)
-        >>> pprint(features('foo'))
-        {'len': 3, 'upper': False}
-
-    """
-    def __init__(self, *feature_funcs):
-        self.feature_funcs = list(feature_funcs)
-
-    def __call__(self, *args, **kwargs):
-        features = [f(*args, **kwargs) for f in self.feature_funcs]
-        return merge_dicts(*features)
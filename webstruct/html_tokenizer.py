@@ -12,28 +12,22 @@ from __future__ import absolute_import, print_function
 import re
 import copy
 from itertools import groupby
-from collections import namedtuple
 from six.moves import zip
 
 from lxml.etree import iterwalk
 
 from webstruct.sequence_encoding import IobEncoder
-from webstruct.text_tokenizers import tokenize, TextToken
+from webstruct.text_tokenizers import tokenize
 from webstruct.utils import (
     replace_html_tags,
     kill_html_tags,
 )
 
 
-_HtmlToken = namedtuple('HtmlToken', ['index',
-                                      'tokens',
-                                      'elem',
-                                      'is_tail',
-                                      'position',
-                                      'length'])
+_MARKER_TOKEN_TYPES = frozenset({'start', 'end'})
 
 
-class HtmlToken(_HtmlToken):
+class HtmlToken(object):
     """
     HTML token info.
 
@@ -46,23 +40,29 @@ class HtmlToken(_HtmlToken):
     * :attr:`is_tail` flag indicates that token belongs to element tail
     * :attr:`position` is logical position(in letters or codepoints) of token start in parent text
     * :attr:`length` is logical length(in letters or codepoints) of token in parent text
+    * :attr:`token` is the current token (as text)
+    * :attr:`parent` is token's parent HTML element (as lxml's Element)
 
     Computed properties:
 
-    * :attr:`token` is the current token (as text);
-    * :attr:`parent` is token's parent HTML element (as lxml's Element);
     * :attr:`root` is an ElementTree this token belongs to.
 
     """
-    @property
-    def token(self):
-        return self.tokens[self.index]
-
-    @property
-    def parent(self):
-        if not self.is_tail:
-            return self.elem
-        return self.elem.getparent()
+    # feature functions read .token and .parent several times per token;
+    # with __slots__ they are direct C-slot reads computed once here,
+    # and instances don't carry a per-token __dict__
+    __slots__ = ['index', 'tokens', 'elem', 'is_tail', 'position', 'length',
+                 'token', 'parent']
+
+    def __init__(self, index, tokens, elem, is_tail, position, length):
+        self.index = index
+        self.tokens = tokens
+        self.elem = elem
+        self.is_tail = is_tail
+        self.position = position
+        self.length = length
+        self.token = tokens[index]
+        self.parent = elem.getparent() if is_tail else elem
 
     @property
     def root(self):
@@ -76,6 +76,70 @@ class HtmlToken(_HtmlToken):
         )
 
 
+class HtmlTokenSequence(object):
+    """
+    Struct-of-arrays representation of a tokenized document, returned by
+    :class:`HtmlTokenizer` instead of a list of :class:`HtmlToken`
+    instances when ``fast_mode`` is enabled.
+
+    Token data is kept in parallel lists instead of one Python object
+    per token:
+
+    * :attr:`tokens` is a list of token texts;
+    * :attr:`parent_tags` is a list of tag names of each token's parent
+      HTML element;
+    * :attr:`is_tails` is a list of flags indicating that a token belongs
+      to an element tail.
+
+    This is enough for feature extraction that only looks at token text
+    and parent tag. Use :meth:`as_html_tokens` to materialize the full
+    :class:`HtmlToken` view when needed.
+    """
+    __slots__ = ['tokens', 'parent_tags', 'is_tails',
+                 '_indices', '_block_tokens', '_elems',
+                 '_positions', '_lengths']
+
+    def __init__(self):
+        self.tokens = []
+        self.parent_tags = []
+        self.is_tails = []
+        self._indices = []
+        self._block_tokens = []
+        self._elems = []
+        self._positions = []
+        self._lengths = []
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def _append_block(self, elem, is_tail, text_tokens):
+        char_tokens = [t.chars for t in text_tokens]
+        if is_tail:
+            parent = elem.getparent()
+            parent_tag = parent.tag if parent is not None else None
+        else:
+            parent_tag = elem.tag
+        n = len(char_tokens)
+        self.tokens.extend(char_tokens)
+        self.parent_tags.extend([parent_tag] * n)
+        self.is_tails.extend([is_tail] * n)
+        self._indices.extend(range(n))
+        self._block_tokens.extend([char_tokens] * n)
+        self._elems.extend([elem] * n)
+        self._positions.extend(t.position for t in text_tokens)
+        self._lengths.extend(t.length for t in text_tokens)
+
+    def as_html_tokens(self):
+        """ Build the list of :class:`HtmlToken` instances lazily. """
+        return [
+            HtmlToken(index, tokens, elem, is_tail, position, length)
+            for index, tokens, elem, is_tail, position, length in zip(
+                self._indices, self._block_tokens, self._elems,
+                self.is_tails, self._positions, self._lengths
+            )
+        ]
+
+
 class HtmlTokenizer(object):
     """
     Class for converting HTML trees (returned by one of the
@@ -111,11 +175,20 @@ class HtmlTokenizer(object):
     ignore_html_tags: set, optional
         A set of HTML tags which won't produce :class:`HtmlToken` instances,
         but will be kept in a tree. Default is ``{'script', 'style'}``.
+    fast_mode: bool, optional
+        When True, :meth:`tokenize_single` returns a
+        :class:`HtmlTokenSequence` (parallel lists of token texts, parent
+        tags and tail flags) instead of a list of :class:`HtmlToken`
+        instances, avoiding one object allocation per token. Use
+        :meth:`HtmlTokenSequence.as_html_tokens` to get the full per-token
+        view back. Default is False.
     """
     def __init__(self, tagset=None, sequence_encoder=None,
                  text_tokenize_func=None, kill_html_tags=None,
-                 replace_html_tags=None, ignore_html_tags=None):
+                 replace_html_tags=None, ignore_html_tags=None,
+                 fast_mode=False):
         self.tagset = set(tagset) if tagset is not None else None
+        self.fast_mode = fast_mode
         self.text_tokenize_func = text_tokenize_func or tokenize
         self.kill_html_tags = kill_html_tags
         self.replace_html_tags = replace_html_tags
@@ -166,13 +239,19 @@ class HtmlTokenizer(object):
             ([], [])
 
         """
-        tree = copy.deepcopy(tree)
+        # copy.copy on an lxml element clones the whole subtree through
+        # lxml's C-level __copy__, skipping the generic deepcopy machinery
+        tree = copy.copy(tree)
         self.sequence_encoder.reset()
         self._prepare_tree(tree)
-        res = list(zip(*self._process_tree(tree)))
-        if not res:
-            return [], []
-        return list(res[0]), list(res[1])
+        if self.fast_mode:
+            return self._process_tree_fast(tree)
+        html_tokens, tags = [], []
+        tokens_append, tags_append = html_tokens.append, tags.append
+        for html_token, tag in self._process_tree(tree):
+            tokens_append(html_token)
+            tags_append(tag)
+        return html_tokens, tags
 
     def tokenize(self, trees):
         X, y = [], []
@@ -270,29 +349,53 @@ class HtmlTokenizer(object):
         if not isinstance(tree.tag, str) or tree.tag in self.ignore_html_tags:
             return
 
-        head_tokens, head_tags = self._tokenize_and_split(tree.text)
-        char_tokens = [t.chars for t in head_tokens]
-        for index, (token, tag) in enumerate(zip(head_tokens, head_tags)):
-            yield HtmlToken(index,
-                            char_tokens,
-                            tree,
-                            False,
-                            token.position,
-                            token.length), tag
-
-        for child in tree:  # where is my precious "yield from"?
-            for html_token, tag in self._process_tree(child):
-                yield html_token, tag
-
-        tail_tokens, tail_tags = self._tokenize_and_split(tree.tail)
-        char_tokens = [t.chars for t in tail_tokens]
-        for index, (token, tag) in enumerate(zip(tail_tokens, tail_tags)):
-            yield HtmlToken(index,
-                            char_tokens,
-                            tree,
-                            True,
-                            token.position,
-                            token.length), tag
+        # iterwalk traverses the DOM in C instead of Python: 'start'
+        # events emit the element text, 'end' events fire after the whole
+        # subtree and emit the tail, which preserves document order
+        ignore = self.ignore_html_tags
+        walker = iterwalk(tree, events=('start', 'end'))
+        for action, elem in walker:
+            if not isinstance(elem.tag, str) or elem.tag in ignore:
+                if action == 'start':
+                    walker.skip_subtree()
+                # the tail of an ignored element is skipped as well
+                continue
+
+            is_tail = action == 'end'
+            text = elem.tail if is_tail else elem.text
+            tokens, tags = self._tokenize_and_split(text)
+            char_tokens = [t.chars for t in tokens]
+            for index, (token, tag) in enumerate(zip(tokens, tags)):
+                yield HtmlToken(index,
+                                char_tokens,
+                                elem,
+                                is_tail,
+                                token.position,
+                                token.length), tag
+
+    def _process_tree_fast(self, tree):
+        # same walk as _process_tree, but tokens go straight into the
+        # parallel lists of an HtmlTokenSequence - no HtmlToken objects
+        seq = HtmlTokenSequence()
+        tags = []
+        if not isinstance(tree.tag, str) or tree.tag in self.ignore_html_tags:
+            return seq, tags
+
+        ignore = self.ignore_html_tags
+        walker = iterwalk(tree, events=('start', 'end'))
+        for action, elem in walker:
+            if not isinstance(elem.tag, str) or elem.tag in ignore:
+                if action == 'start':
+                    walker.skip_subtree()
+                continue
+
+            is_tail = action == 'end'
+            text = elem.tail if is_tail else elem.text
+            block_tokens, block_tags = self._tokenize_and_split(text)
+            if block_tokens:
+                seq._append_block(elem, is_tail, block_tokens)
+                tags.extend(block_tags)
+        return seq, tags
 
     def cleanup_tree(self, tree):
         cleaned = copy.deepcopy(tree)
@@ -309,27 +412,30 @@ class HtmlTokenizer(object):
             elem.tail = self._tag_re.sub("", elem.tail)
 
     def _tokenize_and_split(self, text):
-        text = text or ''
-        input_tokens = [t for t in self.text_tokenize_func(text)]
+        input_tokens = list(self.text_tokenize_func(text or ''))
         input_tokens = self._limit_tags(input_tokens)
-        input_tokens = [TextToken(chars=t.chars,
-                                  position=t.position,
-                                  length=t.length) for t in input_tokens]
         chains = self.sequence_encoder.encode(t.chars for t in input_tokens)
-        chains = self.sequence_encoder.from_indices(chains, input_tokens)
-        chains = [l for l in chains]
+        chains = list(self.sequence_encoder.from_indices(chains, input_tokens))
         return self.sequence_encoder.split(chains)
 
     def _limit_tags(self, input_tokens):
         if self.tagset is None:
             return input_tokens
 
-        proc = self.sequence_encoder.token_processor
-        token_classes = [proc.classify(tok.chars) for tok in input_tokens]
-        return [
-            tok for (tok, (typ, value)) in zip(input_tokens, token_classes)
-            if not (typ in {'start', 'end'} and value not in self.tagset)
-        ]
+        classify = self.sequence_encoder.token_processor.classify
+        tagset = self.tagset
+        # classify is regex-based and depends only on the token text;
+        # memoize it - marker tokens repeat all over the document
+        cache = {}
+        result = []
+        for tok in input_tokens:
+            cls = cache.get(tok.chars)
+            if cls is None:
+                cls = cache[tok.chars] = classify(tok.chars)
+            typ, value = cls
+            if not (typ in _MARKER_TOKEN_TYPES and value not in tagset):
+                result.append(tok)
+        return result
 
     def __getstate__(self):
         dct = self.__dict__.copy()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import unittest
+
+from scipy import sparse as sp
+
+from webstruct import GateLoader, HtmlTokenizer, HtmlFeatureExtractor
+from webstruct.features import token_lower, parent_tag
+
+
+class SparseFeatureExtractionTest(unittest.TestCase):
+
+    def _load_documents(self):
+        loader = GateLoader(known_entities=['PER'])
+        tokenizer = HtmlTokenizer()
+        trees = [
+            loader.loadbytes(b"<p>hello <PER>John</PER> said</p>"),
+            loader.loadbytes(b"<p>goodbye <b>John</b></p>"),
+        ]
+        X, _ = tokenizer.tokenize(trees)
+        return X
+
+    def test_sparse_fit_transform(self):
+        html_token_lists = self._load_documents()
+        fe = HtmlFeatureExtractor(
+            token_features=[token_lower, parent_tag],
+            sparse=True,
+        )
+        X = fe.fit_transform(html_token_lists)
+        self.assertTrue(sp.issparse(X))
+        n_tokens = sum(len(doc) for doc in html_token_lists)
+        self.assertEqual(X.shape[0], n_tokens)
+        self.assertEqual(X.shape[1], len(fe.feature_names_))
+        self.assertIn('parent_tag=p', fe.feature_names_)
+
+    def test_sparse_min_df(self):
+        html_token_lists = self._load_documents()
+        fe = HtmlFeatureExtractor(
+            token_features=[token_lower, parent_tag],
+            min_df=2,
+            sparse=True,
+        )
+        X = fe.fit_transform(html_token_lists)
+        # only features present in both documents survive
+        self.assertIn('lower=john', fe.feature_names_)
+        self.assertIn('parent_tag=p', fe.feature_names_)
+        self.assertNotIn('lower=hello', fe.feature_names_)
+        self.assertNotIn('parent_tag=b', fe.feature_names_)
+        self.assertEqual(X.shape[1], len(fe.feature_names_))
+
+    def test_sparse_transform_matches_fit_transform(self):
+        html_token_lists = self._load_documents()
+        fe = HtmlFeatureExtractor(
+            token_features=[token_lower, parent_tag],
+            min_df=2,
+            sparse=True,
+        )
+        X_fit = fe.fit_transform(html_token_lists)
+        X_new = fe.transform(html_token_lists)
+        self.assertEqual(X_fit.shape, X_new.shape)
+        self.assertEqual((X_fit != X_new).nnz, 0)
+
+    def test_n_jobs(self):
+        html_token_lists = self._load_documents()
+        fe = HtmlFeatureExtractor(token_features=[token_lower, parent_tag])
+        fe_parallel = HtmlFeatureExtractor(
+            token_features=[token_lower, parent_tag],
+            n_jobs=2,
+        )
+        self.assertEqual(
+            fe.fit_transform(html_token_lists),
+            fe_parallel.fit_transform(html_token_lists),
+        )
+
+    def test_dense_default(self):
+        html_token_lists = self._load_documents()
+        fe = HtmlFeatureExtractor(token_features=[token_lower, parent_tag])
+        X = fe.fit_transform(html_token_lists)
+        self.assertIsInstance(X, list)
+        self.assertEqual(len(X), len(html_token_lists))
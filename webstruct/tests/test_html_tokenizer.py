@@ -76,6 +76,32 @@ class HtmlTokenizerTest(HtmlTest):
     def test_tokenize_single_lineends(self):
         self.assertTokenizationWorks(HtmlLoader().loadbytes(ANNOTATED_HTML))
 
+    def test_fast_mode(self):
+        tree = self._load()
+        seq, tags = HtmlTokenizer(fast_mode=True).tokenize_single(tree)
+
+        self.assertListEqual(
+            seq.tokens,
+            [u'Scrapinghub', u'Inc', u'has', u'an', u'office', u'in', u'Montevideo'],
+        )
+        self.assertListEqual(
+            tags,
+            [u'B-ORG', u'I-ORG', 'O', 'O', 'O', 'O', u'B-CITY']
+        )
+        self.assertEqual(len(seq), len(tags))
+
+        # fast mode data matches the regular HtmlToken representation
+        html_tokens, _ = HtmlTokenizer().tokenize_single(self._load())
+        self.assertListEqual(seq.tokens, [t.token for t in html_tokens])
+        self.assertListEqual(seq.parent_tags, [t.parent.tag for t in html_tokens])
+        self.assertListEqual(seq.is_tails, [t.is_tail for t in html_tokens])
+
+        reconstructed = seq.as_html_tokens()
+        self.assertListEqual(
+            [(t.token, t.index, t.is_tail, t.position, t.length) for t in reconstructed],
+            [(t.token, t.index, t.is_tail, t.position, t.length) for t in html_tokens],
+        )
+
     def test_detokenize_single(self):
         src_tree = self._load()
         orig_src_tree = deepcopy(src_tree)
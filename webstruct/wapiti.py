@@ -12,13 +12,14 @@ import os
 import re
 import six
 import shlex
+import operator
 import tempfile
 import copy
 from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.pipeline import Pipeline
 from webstruct import HtmlFeatureExtractor
 from webstruct.base import BaseSequenceClassifier
-from webstruct.utils import get_combined_keys, run_command
+from webstruct.utils import run_command
 from webstruct._fileresource import FileResource
 from webstruct.sequence_encoding import IobEncoder
 
@@ -291,21 +292,26 @@ class WapitiCRF(BaseSequenceClassifier):
         self._wapiti_model = wapiti.Model(model=self.modelfile.name)
 
     def _to_wapiti_sequences(self, X, y=None):
-        X = self.feature_encoder.transform(X)
+        return list(self._iter_wapiti_sequences(X, y))
+
+    def _iter_wapiti_sequences(self, X, y=None):
+        transform_single = self.feature_encoder.transform_single
         if y is None:
-            return ["\n".join(lines) for lines in X]
+            for feature_dicts in X:
+                yield "\n".join(transform_single(feature_dicts))
         else:
-            return [
-                self._to_train_sequence(lines, tags) for lines, tags in zip(X, y)
-            ]
+            for feature_dicts, tags in zip(X, y):
+                yield self._to_train_sequence(transform_single(feature_dicts), tags)
 
     def _create_wapiti_data_file(self, X, y=None):
         """
         Create a file with input data for wapiti. Return a resulting file name;
         caller should unlink the file.
         """
+        # sequences are generated and encoded one document at a time, so
+        # peak memory doesn't grow by the size of the training file
         with tempfile.NamedTemporaryFile('wb', prefix="wapiti-data-", suffix=".txt", dir=self.tempdir, delete=False) as fp:
-            for seq in self._to_wapiti_sequences(X, y):
+            for seq in self._iter_wapiti_sequences(X, y):
                 fp.write(seq.encode('utf8'))
                 fp.write(b"\n\n")
         return fp.name
@@ -342,6 +348,7 @@ class WapitiFeatureEncoder(BaseEstimator, TransformerMixin):
         self.move_to_front = tuple(move_to_front)
         self.feature_names_ = None
         self.vocabulary_ = None
+        self._getter = None
 
     def fit(self, X, y=None):
         """
@@ -352,14 +359,19 @@ class WapitiFeatureEncoder(BaseEstimator, TransformerMixin):
         return self.partial_fit(X)
 
     def partial_fit(self, X, y=None):
-        keys = set(self.feature_names_ or set())
-        move_to_front = set(self.move_to_front)
-
+        # accumulate into one set via in-place update over dict key views
+        # (a single C loop per dict) instead of allocating two temporary
+        # sets per document with | and -
+        keys = set(self.feature_names_ or ())
         for feature_dicts in X:
-            keys = (keys | get_combined_keys(feature_dicts)) - move_to_front
+            for dct in feature_dicts:
+                keys.update(dct)
+        keys.difference_update(self.move_to_front)
 
-        self.feature_names_ = self.move_to_front + tuple(keys)
+        # sorted() keeps column order deterministic across runs
+        self.feature_names_ = self.move_to_front + tuple(sorted(keys))
         self.vocabulary_ = dict((f, i) for i, f in enumerate(self.feature_names_))
+        self._getter = None
         return self
 
     def transform_single(self, feature_dicts):
@@ -367,10 +379,24 @@ class WapitiFeatureEncoder(BaseEstimator, TransformerMixin):
         Transform a sequence of dicts ``feature_dicts``
         to a list of Wapiti data file lines.
         """
+        names = self.feature_names_
+        getter = self._getter
+        if getter is None:
+            # itemgetter fetches all columns in one C call per row
+            getter = self._getter = operator.itemgetter(*names)
+        single = len(names) == 1
         lines = []
+        append = lines.append
         for dct in feature_dicts:
-            line = ' '.join(_tostr(dct.get(key)) for key in self.feature_names_)
-            lines.append(line)
+            try:
+                values = getter(dct)
+            except KeyError:
+                # missing keys: fall back to dict.get, like before
+                values = map(dct.get, names)
+            else:
+                if single:
+                    values = (values,)
+            append(' '.join(map(_tostr, values)))
         return lines
 
     def transform(self, X):
@@ -427,6 +453,7 @@ class WapitiFeatureEncoder(BaseEstimator, TransformerMixin):
 
     def reset(self):
         self.feature_names_ = None
+        self._getter = None
 
 
 
@@ -460,20 +487,34 @@ def prepare_wapiti_template(template, vocabulary):
     * http://crfpp.googlecode.com/svn/trunk/doc/index.html#templ
 
     """
-    def repl(m):
-        column = m.group('column')
-        if not column.isdigit():
-            column = vocabulary[column]
-        return "{0[macro]}[{0[offset]},{1}{0[rest]}".format(m.groupdict(), column)
-
     lines = [
-        (WAPITI_MACRO_PATTERN.sub(repl, line) if not _wapiti_line_is_comment(line) else line)
+        (_substitute_macros(line, vocabulary) if not _wapiti_line_is_comment(line) else line)
         for line in template.splitlines()
     ]
 
     return "\n".join(lines)
 
 
+def _substitute_macros(line, vocabulary):
+    # splice replacements in manually instead of using re.sub with a
+    # Python callback: no groupdict() dict and no str.format parsing
+    # per match, just one C-level scan and a final join
+    pieces = []
+    pos = 0
+    for m in WAPITI_MACRO_PATTERN.finditer(line):
+        column = m.group('column')
+        if not column.isdigit():
+            column = str(vocabulary[column])
+        pieces.extend((line[pos:m.start()],
+                       m.group('macro'), '[', m.group('offset'), ',',
+                       column, m.group('rest')))
+        pos = m.end()
+    if not pieces:
+        return line
+    pieces.append(line[pos:])
+    return ''.join(pieces)
+
+
 def _tostr(val):
     """
     >>> _tostr('foo')
@@ -494,5 +535,9 @@ def _tostr(val):
     return str(val)
 
 
+_WAPITI_COMMENT_RE = re.compile(r'\A\s*#')
+
 def _wapiti_line_is_comment(line):
-    return line.strip().startswith('#')
+    # a regex probe instead of strip().startswith() - no throwaway
+    # stripped string per line
+    return _WAPITI_COMMENT_RE.match(line) is not None